@@ -1,13 +1,20 @@
 #!/usr/bin/env python3
 import argparse
 import json
-from dataclasses import dataclass
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
 
 import requests
 import os
 import re
+import shutil
+import struct
+import tempfile
 
 from datetime import datetime
+from functools import cache
+from itertools import repeat
 from halo import Halo
 from tabulate import tabulate
 from tqdm import tqdm
@@ -15,20 +22,81 @@ from urllib.parse import urlparse
 from exif import Image
 
 # Parse format: YYYYMMDD
-REGEX_DATE = r'(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})'
-FILES_EXT = ['jpeg', 'jpg', 'mp4']
-
-
-@dataclass
-class File(object):
-    filename = ''
-    file_path = ''
-    new_file_path = ''
-    extension = ''
-    parsed_date = ''
+REGEX_DATE = re.compile(r'(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})', re.ASCII)
+# Whatsapp images names format: IMG-YYYYMMDD-WA0000
+WHATSAPP_IMAGE_PREFIX = 'IMG-'
+# Exif date format: YYYY:MM:DD HH:MM:SS
+REGEX_EXIF_DATE = re.compile(r'\d{4}:\d{2}:\d{2} \d{2}:\d{2}:\d{2}', re.ASCII)
+REGEX_EXIF_DATE_BYTES = re.compile(rb'\d{4}:\d{2}:\d{2} \d{2}:\d{2}:\d{2}')
+# Only images carry exif data, videos are listed but never parsed.
+IMAGES_EXT = ['jpeg', 'jpg']
+VIDEOS_EXT = ['mp4']
+FILES_EXT = IMAGES_EXT + VIDEOS_EXT
+# Matches a file name ending with one of the given extensions.
+EXT_PATTERN = r'\.(?:%s)$'
+REGEX_FILES_EXT = re.compile(EXT_PATTERN % '|'.join(map(re.escape, FILES_EXT)), re.IGNORECASE)
+REGEX_IMAGES_EXT = re.compile(EXT_PATTERN % '|'.join(map(re.escape, IMAGES_EXT)), re.IGNORECASE)
+
+STATUS_PROCESSED = 'processed'
+STATUS_SKIPPED = 'skipped'
+STATUS_NO_DATE = 'no_date'
+STATUS_FAILED = 'failed'
+
+# JPEG exif data lives in an APP1 segment before the image data, the header is read by chunks until it's found.
+EXIF_HEADER_SIZE = 65536
+# The JPEG markers couldn't be walked up to the image data, so whether the file has exif is unknown.
+EXIF_SEGMENT_UNKNOWN = object()
+EXIF_IDENTIFIER = b'Exif\x00\x00'
+JPEG_SOI = b'\xff\xd8'
+JPEG_EOI = b'\xff\xd9'
+# Tiff tags and types used to add an exif IFD holding the original date.
+TIFF_TAG_EXIF_IFD = 0x8769
+TIFF_TAG_DATETIME_ORIGINAL = 0x9003
+TIFF_TYPE_ASCII = 2
+TIFF_TYPE_LONG = 4
+# Same length as an exif date, swapped for the real date in the exif segment template.
+EXIF_DATE_PLACEHOLDER = 'YYYY:MM:DD HH:MM:SS'
+
+# Buffer size used to copy the image data after the exif segment.
+COPY_BUFFER_SIZE = 1 << 20
+
+# Number of files handed to a worker process at once.
+BATCH_SIZE = 16
+# Number of files read ahead of the one being processed in a worker.
+PREFETCH_SIZE = 4
+
+
+@dataclass(slots=True)
+class Files:
+    """Media files stored column by column, a file is addressed by its index."""
+    file_paths: list[str] = field(default_factory=list)
+    filenames: list[str] = field(default_factory=list)
+    extensions: list[str] = field(default_factory=list)
+    parsed_dates: list[str | None] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.file_paths)
 
     def __repr__(self):
-        return f'Filename: {self.filename}'
+        return f'Filenames: {self.filenames}'
+
+    def append(self, file_path, filename, extension):
+        self.file_paths.append(file_path)
+        self.filenames.append(filename)
+        self.extensions.append(extension)
+        self.parsed_dates.append(None)
+
+    def take(self, indexes):
+        """
+        Build a new files object with only the given indexes.
+        :param indexes: List of file indexes.
+        :return: Files object.
+        """
+        return Files(
+            file_paths=[self.file_paths[i] for i in indexes],
+            filenames=[self.filenames[i] for i in indexes],
+            extensions=[self.extensions[i] for i in indexes],
+            parsed_dates=[self.parsed_dates[i] for i in indexes])
 
 
 def parse_arguments():
@@ -57,128 +125,532 @@ def get_files_from_path(path=None, ext_list=None):
     Get all files from a given path.
     :param path: Path to scan.
     :param ext_list: List of allowed extentions.
-    :return: List of files.
+    :return: Tuple of image files and video files.
+    """
+    images = Files()
+    videos = Files()
+    ext_regex = REGEX_FILES_EXT
+    if ext_list:
+        ext_regex = re.compile(EXT_PATTERN % '|'.join(map(re.escape, ext_list)), re.IGNORECASE)
+
+    # Top-down: a directory's files come before its subdirectories, which are visited in listing order.
+    dirs = deque([path])
+    while dirs:
+        subdirs = []
+        # Like os.walk, directories that can't be listed are ignored.
+        try:
+            entries = os.scandir(dirs.pop())
+        except OSError:
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and ext_regex.search(entry.name):
+                    filename, extension = os.path.splitext(entry.name)
+                    files = images if REGEX_IMAGES_EXT.search(extension) else videos
+                    files.append(file_path=entry.path, filename=filename, extension=extension)
+        dirs.extend(reversed(subdirs))
+
+    return images, videos
+
+
+def read_file(files, i):
     """
-    files = []
-    allowed_extensions = ext_list if ext_list else FILES_EXT
+    Read the start of the file, up to the end of its exif segment.
+    The image data after it is copied as is when saving, so it's never read here.
+    :param files: Files object.
+    :param i: File index.
+    :return: Tuple of the file header bytes and its exif segment span, (None, None) if the file can't be read.
+    """
+    try:
+        with open(files.file_paths[i], 'rb') as media_file:
+            data = media_file.read(EXIF_HEADER_SIZE)
+            span = find_exif_segment(data)
+            while span is EXIF_SEGMENT_UNKNOWN:
+                chunk = media_file.read(EXIF_HEADER_SIZE)
+                if not chunk:
+                    break
+                data += chunk
+                span = find_exif_segment(data)
+            if span and span is not EXIF_SEGMENT_UNKNOWN and span[1] > len(data):
+                data += media_file.read(span[1] - len(data))
+            return data, span
+    except OSError:
+        return None, None
+
+
+def prefetch_files(files, size=PREFETCH_SIZE):
+    """
+    Read files ahead on a thread pool while the current one is processed.
+    :param files: Files object.
+    :param size: Number of files to read ahead.
+    :return: Generator of file index and its header bytes and exif segment span.
+    """
+    with ThreadPoolExecutor(max_workers=size) as pool:
+        pending = deque()
+        for i in range(len(files)):
+            pending.append((i, pool.submit(read_file, files, i)))
+            if len(pending) > size:
+                head, future = pending.popleft()
+                yield head, future.result()
+
+        while pending:
+            head, future = pending.popleft()
+            yield head, future.result()
+
 
-    for root, dirs, filenames in os.walk(path, topdown=False):
-        for filename in filenames:
-            if [x for x in filenames if filename.endswith(tuple(allowed_extensions))]:
-                file = File()
-                file.file_path = os.path.join(root, filename)
-                file.extension = os.path.splitext(filename)[-1]
-                file.filename = os.path.splitext(filename)[0]
-                files.append(file)
+def load_image(data):
+    """
+    Load an image object from file bytes.
+    :param data: File bytes.
+    :return: Image object, None if the file can't be parsed.
+    """
+    try:
+        return Image(data)
+    except Exception as e:
+        print(f"\n{str(e)}")
+        return None
 
-    return files
 
+def find_exif_segment(data):
+    """
+    Walk the JPEG markers before the image data and find the exif APP1 segment.
+    :param data: File bytes.
+    :return: Tuple of the segment start and end offsets, None if the file has no exif segment,
+        EXIF_SEGMENT_UNKNOWN if the bytes end or are corrupt before the image data is reached.
+    """
+    if not data.startswith(JPEG_SOI):
+        return None
+
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xff:
+            return EXIF_SEGMENT_UNKNOWN
+        marker = data[offset + 1]
+        if marker == 0xff:
+            offset += 1
+            continue
+        if marker in (0xd9, 0xda):
+            return None
+
+        length = int.from_bytes(data[offset + 2:offset + 4], 'big')
+        if marker == 0xe1:
+            if offset + 4 + len(EXIF_IDENTIFIER) > len(data):
+                return EXIF_SEGMENT_UNKNOWN
+            if data[offset + 4:offset + 4 + len(EXIF_IDENTIFIER)] == EXIF_IDENTIFIER:
+                return offset, offset + 2 + length
+        offset += 2 + length
+
+    return EXIF_SEGMENT_UNKNOWN
+
+
+def read_exif_segment(data, span):
+    """
+    Read the exif APP1 segment payload.
+    :param data: File bytes.
+    :param span: Exif segment span from find_exif_segment.
+    :return: Exif segment payload, None if not found.
+    """
+    if span is None:
+        return None
 
-def check_exif(file):
+    start, end = span
+    return data[start + 4 + len(EXIF_IDENTIFIER):end]
+
+
+def load_exif_image(data, span):
+    """
+    Load an image object from the exif APP1 segment only, so the image data itself is never scanned.
+    :param data: File bytes.
+    :param span: Exif segment span from find_exif_segment.
+    :return: Image object, None if the file can't be parsed.
+    """
+    start, end = span or (len(JPEG_SOI), len(JPEG_SOI))
+    return load_image(JPEG_SOI + data[start:end] + JPEG_EOI)
+
+
+def get_image_exif_segment(img):
+    """
+    Get the exif APP1 segment bytes of an image loaded with load_exif_image.
+    :param img: Image object.
+    :return: Exif segment bytes.
+    """
+    return img.get_file()[len(JPEG_SOI):-len(JPEG_EOI)]
+
+
+@cache
+def get_exif_segment_template():
+    """
+    Build once the exif APP1 segment written to files without exif, holding a placeholder date.
+    :return: Exif segment bytes.
+    """
+    img = Image(JPEG_SOI + JPEG_EOI)
+    img.date_time = EXIF_DATE_PLACEHOLDER
+    img.datetime_original = EXIF_DATE_PLACEHOLDER
+    return get_image_exif_segment(img)
+
+
+def add_exif_ifd(exif_segment, parsed_date):
+    """
+    Add an exif IFD holding the original date to an exif segment that only has the 0th IFD.
+    The 0th IFD is copied at the end of the segment with the exif IFD pointer added, its tags values are kept in place.
+    :param exif_segment: Exif APP1 segment bytes.
+    :param parsed_date: Date in exif format.
+    :return: New exif segment bytes, None if the segment can't be updated.
+    """
+    tiff = exif_segment[4 + len(EXIF_IDENTIFIER):]
+    byte_order = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if byte_order is None or len(tiff) < 8:
+        return None
+
+    ifd_offset, = struct.unpack(f'{byte_order}I', tiff[4:8])
+    if ifd_offset + 2 > len(tiff):
+        return None
+    entries_count, = struct.unpack(f'{byte_order}H', tiff[ifd_offset:ifd_offset + 2])
+    entries_end = ifd_offset + 2 + 12 * entries_count
+    if entries_end + 4 > len(tiff):
+        return None
+
+    entries = [tiff[offset:offset + 12] for offset in range(ifd_offset + 2, entries_end, 12)]
+    tags = [struct.unpack(f'{byte_order}H', entry[:2])[0] for entry in entries]
+    if TIFF_TAG_EXIF_IFD in tags:
+        return None
+    next_ifd = tiff[entries_end:entries_end + 4]
+
+    # IFDs start on a word boundary.
+    padding = b'\x00' * (len(tiff) % 2)
+    new_ifd_offset = len(tiff) + len(padding)
+    exif_ifd_offset = new_ifd_offset + 2 + 12 * (entries_count + 1) + 4
+    date_offset = exif_ifd_offset + 2 + 12 + 4
+
+    entries.append(struct.pack(f'{byte_order}HHII', TIFF_TAG_EXIF_IFD, TIFF_TYPE_LONG, 1, exif_ifd_offset))
+    entries.sort(key=lambda entry: struct.unpack(f'{byte_order}H', entry[:2])[0])
+    new_ifd = struct.pack(f'{byte_order}H', len(entries)) + b''.join(entries) + next_ifd
+
+    date = parsed_date.encode('ascii') + b'\x00'
+    exif_ifd = struct.pack(f'{byte_order}H', 1) \
+        + struct.pack(f'{byte_order}HHII', TIFF_TAG_DATETIME_ORIGINAL, TIFF_TYPE_ASCII, len(date), date_offset) \
+        + struct.pack(f'{byte_order}I', 0) \
+        + date
+
+    new_tiff = tiff[:4] + struct.pack(f'{byte_order}I', new_ifd_offset) + tiff[8:] + padding + new_ifd + exif_ifd
+    length = 2 + len(EXIF_IDENTIFIER) + len(new_tiff)
+    if length > 0xffff:
+        return None
+
+    return exif_segment[:2] + struct.pack('>H', length) + EXIF_IDENTIFIER + new_tiff
+
+
+def check_exif(data, span):
     """
-    Check if a file has exif data.
-    :param file: File path.
-    :return: True if file has exif data, False otherwise.
+    Check if a file already has an exif original date.
+    :param data: File bytes.
+    :param span: Exif segment span from find_exif_segment.
+    :return: True if file has a valid exif original date, False otherwise.
     """
+    exif_segment = read_exif_segment(data, span)
+    # No date string anywhere in the raw segment means no original date either.
+    if exif_segment is None or not REGEX_EXIF_DATE_BYTES.search(exif_segment):
+        return False
+
+    img = load_exif_image(data, span)
+    if img is None:
+        return False
+
     try:
-        with open(file.file_path, 'rb') as image_file:
-            my_image = Image(image_file)
-        has_exif = True if my_image.has_exif else False
-    except:
-        has_exif = False
+        date_original = img.get('datetime_original')
+    except Exception:
+        return False
 
-    return has_exif
+    return bool(date_original and REGEX_EXIF_DATE.match(date_original))
 
 
-def parse_filename_to_date(file):
+def parse_filename_to_date(files, i):
     """ Parse and return only date from the filename.
-    :param file: File path.
+    :param files: Files object.
+    :param i: File index.
     :return: Date if found, None otherwise.
     """
-    match = re.search(REGEX_DATE, file.filename)
-    if match:
-        date_dict = match.groupdict()
-        file.parsed_date = f"{date_dict['year']}-{date_dict['month']}-{date_dict['day']}"
+    filename = files.filenames[i]
+    name_date = filename[len(WHATSAPP_IMAGE_PREFIX):len(WHATSAPP_IMAGE_PREFIX) + 8]
+
+    # Whatsapp names don't need the regex, and names too short to hold a date can't match it.
+    # Only ASCII digits, as REGEX_DATE matches and as exif dates must be.
+    if filename.startswith(WHATSAPP_IMAGE_PREFIX) and len(name_date) == 8 \
+            and name_date.isascii() and name_date.isdecimal():
+        year, month, day = name_date[:4], name_date[4:6], name_date[6:]
+    elif len(filename) < 8:
+        return files.parsed_dates[i]
+    else:
+        match = REGEX_DATE.search(filename)
+        if not match:
+            return files.parsed_dates[i]
+        year, month, day = match.group('year', 'month', 'day')
 
-    return file
+    files.parsed_dates[i] = f"{year}:{month}:{day} 00:00:00"
 
+    return files.parsed_dates[i]
 
-def read_image_data(file):
+
+def set_image_date(files, i, img):
     """
-    Read image data from file.
-    :param file: File object.
-    :return: Image file object.
+    Set the parsed file date on the image data.
+    :param files: Files object.
+    :param i: File index.
+    :param img: Image object.
+    :return: Image file object, None if the date can't be set.
     """
-    img = None
     try:
-        with open(file.file_path, 'rb') as image_file:
-            img = Image(image_file)
-            img.date_time = file.parsed_date
-            img.datetime_original = file.parsed_date
-    except Exception as e:
-        print(f"\n{str(e)}")
+        img.date_time = files.parsed_dates[i]
+        img.datetime_original = files.parsed_dates[i]
+    except Exception:
+        return None
 
     return img
 
 
-def save_exif_data(file, img, output_path, overwrite=False):
-    """Read a date from file data and save it to output path.
-    :param file: File object.
-    :param img: Image object.
-    :param output_path: Output path.
-    :param overwrite: Overwrite the output file.
+def build_exif_segment(files, i, data, span):
     """
-    new_name = file.filename.split('.')[0] + file.extension
-    new_file_path = os.path.join(output_path, new_name)
+    Build the exif APP1 segment holding the parsed file date.
+    :param files: Files object.
+    :param i: File index.
+    :param data: File bytes.
+    :param span: Exif segment span from find_exif_segment.
+    :return: Exif segment bytes, None if the existing exif data can't be parsed or updated.
+    """
+    parsed_date = files.parsed_dates[i]
+    if span is None:
+        # Only the date differs between files without exif, fill it in the prebuilt segment.
+        return get_exif_segment_template().replace(EXIF_DATE_PLACEHOLDER.encode('ascii'), parsed_date.encode('ascii'))
 
-    try:
-        if overwrite:
-            if os.path.exists(new_file_path):
-                os.remove(new_file_path)
-        else:
-            if os.path.exists(new_file_path):
-                print(f"File or Path already exists: {new_file_path}")
-                return
+    img = load_exif_image(data=data, span=span)
+    if img is None:
+        return None
+
+    img = set_image_date(files=files, i=i, img=img)
+    if img is not None:
+        return get_image_exif_segment(img)
+
+    # The exif package can't add an exif IFD to a segment with only the 0th IFD, add it directly.
+    start, end = span
+    exif_segment = add_exif_ifd(exif_segment=data[start:end], parsed_date=parsed_date)
+    if exif_segment is None:
+        print(f"\nCan't add the exif date to: {files.file_paths[i]}")
+
+    return exif_segment
 
-        with open(new_file_path, 'wb') as new_image_file:
-            new_image_file.write(img.get_file())
+
+def filter_existing_files(files, output_path, overwrite=False):
+    """
+    Drop files whose output name already exists, listing the output path only once.
+    :param files: Files object.
+    :param output_path: Output path.
+    :param overwrite: Overwrite the output files that existed before the run.
+    :return: Tuple of files to process, files already existing in output path,
+        files whose name was already claimed by another file in this run
+        and files whose output would be the input file itself.
+    """
+    try:
+        existing = set(os.listdir(output_path))
+    except FileNotFoundError:
+        existing = set()
+
+    claimed = set()
+    to_process = []
+    skipped = []
+    duplicates = []
+    same_files = []
+    for i, (filename, extension) in enumerate(zip(files.filenames, files.extensions)):
+        new_name = filename + extension
+        # Writing an input file over itself would lose its image data, whatever overwrite is set to.
+        # Only a name already in the output path can point back to the input file.
+        if new_name in existing and \
+                os.path.realpath(os.path.join(output_path, new_name)) == os.path.realpath(files.file_paths[i]):
+            same_files.append(i)
+            continue
+        # Two files with the same name in different folders would be written to the same output file,
+        # possibly at once by different worker processes, so only the first one is kept.
+        if new_name in claimed:
+            duplicates.append(i)
+            continue
+        if new_name in existing and not overwrite:
+            skipped.append(i)
+            continue
+        claimed.add(new_name)
+        to_process.append(i)
+
+    return files.take(to_process), files.take(skipped), files.take(duplicates), files.take(same_files)
+
+
+def copy_file_data(src_file, dst_file, offset):
+    """
+    Copy the source file from offset to the end of the destination file, in the kernel when possible.
+    :param src_file: Source file object.
+    :param dst_file: Destination file object.
+    :param offset: Source file offset to copy from.
+    """
+    dst_file.flush()
+    if hasattr(os, 'sendfile'):
+        try:
+            while sent := os.sendfile(dst_file.fileno(), src_file.fileno(), offset, COPY_BUFFER_SIZE):
+                offset += sent
+            return
+        except OSError:
+            # Some platforms only send to sockets, fall back to a buffered copy.
+            pass
+
+    src_file.seek(offset)
+    shutil.copyfileobj(src_file, dst_file, COPY_BUFFER_SIZE)
+
+
+def save_exif_data(files, i, data, span, exif_segment, output_prefix):
+    """Save the file with its new exif segment to output path.
+    The new exif segment replaces or is inserted in place of the original one, the image data is copied as is.
+    :param files: Files object.
+    :param i: File index.
+    :param data: File header bytes.
+    :param span: Exif segment span from find_exif_segment.
+    :param exif_segment: New exif segment bytes.
+    :param output_prefix: Output path ending with a path separator.
+    :return: New file path, None if the file can't be written.
+    """
+    new_name = files.filenames[i] + files.extensions[i]
+    new_file_path = output_prefix + new_name
+    start, end = span or (len(JPEG_SOI), len(JPEG_SOI))
+
+    # The image data is streamed from the source, which must not be the file being written.
+    if os.path.exists(new_file_path) and os.path.samefile(files.file_paths[i], new_file_path):
+        print(f"\nOutput file is the input file: {new_file_path}")
+        return None
+
+    # Write to a temporary file next to the output and move it over the target once complete,
+    # an interrupted or failed copy never leaves a truncated file behind.
+    temp_file_path = None
+    try:
+        temp_fd, temp_file_path = tempfile.mkstemp(prefix=f'.{new_name}.', suffix='.tmp', dir=output_prefix)
+        with open(files.file_paths[i], 'rb') as image_file, open(temp_fd, 'wb') as new_image_file:
+            new_image_file.write(data[:start])
+            new_image_file.write(exif_segment)
+            copy_file_data(image_file, new_image_file, end)
+        shutil.copymode(files.file_paths[i], temp_file_path)
+        os.replace(temp_file_path, new_file_path)
 
     except Exception as e:
         print(f"\n{str(e)}")
+        if temp_file_path is not None:
+            try:
+                os.remove(temp_file_path)
+            except OSError:
+                pass
+        return None
 
-    file.new_file_path = new_file_path
+    return new_file_path
+
+
+def process_file(files, i, output_prefix, header=None):
+    """
+    Parse the date from a file name and save it as exif data to output path.
+    :param files: Files object.
+    :param i: File index.
+    :param output_prefix: Output path ending with a path separator.
+    :param header: Tuple of the file header bytes and exif segment span, read from the file path if not given.
+    :return: File status.
+    """
+    # The exif segment span is found once when reading, and passed down to every step.
+    data, span = header if header is not None else read_file(files=files, i=i)
+    if data is None or not data.startswith(JPEG_SOI) or span is EXIF_SEGMENT_UNKNOWN \
+            or check_exif(data=data, span=span):
+        return STATUS_SKIPPED
+
+    if parse_filename_to_date(files=files, i=i) is None:
+        return STATUS_NO_DATE
+
+    exif_segment = build_exif_segment(files=files, i=i, data=data, span=span)
+    if exif_segment is None:
+        return STATUS_FAILED
+
+    saved = save_exif_data(
+        files=files,
+        i=i,
+        data=data,
+        span=span,
+        exif_segment=exif_segment,
+        output_prefix=output_prefix)
+    if saved is None:
+        return STATUS_FAILED
+
+    return STATUS_PROCESSED
+
+
+def process_files(files, output_prefix):
+    """
+    Process a batch of files, reading the next ones while the current one is processed.
+    :param files: Files object.
+    :param output_prefix: Output path ending with a path separator.
+    :return: List of the status of each file.
+    """
+    statuses = []
+    for i, header in prefetch_files(files):
+        # One bad file must not stop the rest of the run.
+        try:
+            status = process_file(files, i, output_prefix, header)
+        except Exception as e:
+            print(f"\n{files.file_paths[i]}: {str(e)}")
+            status = STATUS_FAILED
+        statuses.append(status)
 
-    return file
+    return statuses
 
 
 def main():
     args = parse_arguments()
     spinner = Halo(text='Retrieving list of media files...', spinner='dots')
     spinner.start()
+    statuses_count = Counter()
 
     try:
-        files_list = get_files_from_path(path=args.input_path)
-
-        for file in files_list:
-            spinner.text = f'Processing: {file.filename}'
-
-            if not check_exif(file=file):
-                file = parse_filename_to_date(file=file)
-
-                if file.parsed_date is None:
-                    continue
-                img = read_image_data(file=file)
-                save_exif_data(
-                    file=file,
-                    img=img,
-                    output_path=args.output_path,
-                    overwrite=args.overwrite)
-                spinner.succeed(f"Processing complete on file: '{file.filename}'")
-            else:
-                spinner.info(f"Skipping file: '{file.filename}'")
+        os.makedirs(args.output_path, exist_ok=True)
+        # Output files paths are built by concatenation on this prefix.
+        output_prefix = os.path.join(args.output_path, '')
+
+        files_list, videos_list = get_files_from_path(path=args.input_path)
+        if videos_list:
+            spinner.info(f"Skipping {len(videos_list)} video files, exif is only written to images")
+        files_list, existing_files, duplicate_files, same_files = filter_existing_files(
+            files=files_list,
+            output_path=args.output_path,
+            overwrite=args.overwrite)
+
+        for filename, extension in zip(existing_files.filenames, existing_files.extensions):
+            spinner.info(f"File or Path already exists: '{filename}{extension}'")
+        for file_path in duplicate_files.file_paths:
+            spinner.info(f"Skipping file with an already used name: '{file_path}'")
+        for file_path in same_files.file_paths:
+            spinner.info(f"Skipping file, output path is the input file: '{file_path}'")
+
+        batches = [files_list.take(range(i, min(i + BATCH_SIZE, len(files_list))))
+                   for i in range(0, len(files_list), BATCH_SIZE)]
+        # The progress bar takes over the terminal, it rate limits its own repaints.
+        spinner.stop()
+
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor, \
+                tqdm(total=len(files_list), unit='file') as progress:
+            results = executor.map(
+                process_files,
+                batches,
+                repeat(output_prefix))
+
+            for statuses in results:
+                statuses_count.update(statuses)
+                progress.update(len(statuses))
     except Exception as e:
         spinner.info(f"An error occurred: {str(e)}")
-    spinner.succeed("Run complete.")
+    spinner.succeed(f"Run complete. Processed: {statuses_count[STATUS_PROCESSED]}, "
+                    f"skipped: {statuses_count[STATUS_SKIPPED]}, "
+                    f"no date in name: {statuses_count[STATUS_NO_DATE]}, "
+                    f"failed: {statuses_count[STATUS_FAILED]}.")
 
 
 if __name__ == '__main__':